@@ -1,16 +1,23 @@
 """Common utility functions and classes shared between all missions"""
 import krpc
 from spacelib import control
+from spacelib.timing import PendingEvents
 
 
 class Spacecraft():
-    """A collection of objects to be shared accross a mission"""
-    def __init__(self, title: str=None) -> None:
-        self.conn = krpc.connect(name=title)
+    """A collection of objects to be shared accross a mission
+
+    An existing connection and vessel can be given to share one kRPC
+    connection between several spacecraft, e.g. when flying multiple
+    missions from missionlib.runner.
+    """
+    def __init__(self, title: str=None, conn=None, vessel=None) -> None:
+        self.conn = conn if conn is not None else krpc.connect(name=title)
         self.sc = self.conn.space_center
-        self.ves = self.sc.active_vessel
+        self.ves = vessel if vessel is not None else self.sc.active_vessel
         self.events = {}
         self.parts = {}
+        self.waits = PendingEvents()
         self.control = Control(self)
 
         
@@ -0,0 +1,255 @@
+"""Fly several missions at once
+
+Every mission module exposes `async def main(s: Spacecraft)`. The runner
+imports the requested missions, gives each one its own Spacecraft built on
+a single shared kRPC connection, and schedules all of them on one event loop.
+Shutdown and error handling is done here, so that one failing mission does
+not take down the others.
+
+Missions are given as `module[@vessel name]`. Without a vessel name the
+active vessel is used.
+
+Example uses:
+    ```
+    python -m missionlib.runner missionlib.suborbital.newton_4
+    python -m missionlib.runner \\
+        "missionlib.suborbital.newton_4@Newton 4" \\
+        "missionlib.suborbital.newton_x@Newton X"
+    ```
+
+When all missions are finished, time spent on the event loop by each mission
+is reported. Since kRPC calls are blocking, a mission with high loop time is
+delaying every other mission that shares the loop. Tasks a mission starts with
+`asyncio.create_task` are counted towards that mission as well.
+
+On Ctrl-C every mission is cancelled. Threads still waiting in timer() or
+until() are released by removing their kRPC events before the loop joins
+them. The connection is closed after that.
+"""
+import argparse
+import asyncio
+import contextvars
+import importlib
+import sys
+import time
+import types
+from typing import Callable, Coroutine
+import krpc
+from missionlib.commons import Spacecraft
+from spacelib.telemetry import colorlog
+logging = colorlog.getLogger(__name__, colorlog.ALL)
+_usage: 'contextvars.ContextVar[LoopUsage]' = contextvars.ContextVar(
+    'mission_usage', default=None)
+
+
+class LoopUsage():
+    """Event loop time used by a single mission"""
+    def __init__(self) -> None:
+        self.busy = 0.0
+        self.longest = 0.0
+        self.steps = 0
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def add(self, duration: float):
+        self.busy += duration
+        self.steps += 1
+        if duration > self.longest:
+            self.longest = duration
+
+    @property
+    def elapsed(self) -> float:
+        return self.end_time - self.start_time
+
+
+class Mission():
+    """A mission main coroutine function and the vessel it should fly"""
+    def __init__(self, name: str, main: Callable[[Spacecraft], Coroutine],
+                 vessel: str=None) -> None:
+        self.name = name
+        self.main = main
+        self.vessel = vessel
+        self.spacecraft: Spacecraft = None
+        self.usage = LoopUsage()
+        self.error: BaseException = None
+        self.finished = False
+
+    @classmethod
+    def load(cls, spec: str) -> 'Mission':
+        """Import a mission from `module[@vessel name]`"""
+        module_name, _, vessel = spec.partition('@')
+        module = importlib.import_module(module_name)
+        if not hasattr(module, 'main'):
+            raise KeyError('Mission has no main coroutine:', module_name)
+        return cls(module_name, module.main, vessel if vessel else None)
+
+
+@types.coroutine
+def _measured(coro: Coroutine, usage: LoopUsage):
+    """Drive `coro` while adding up the time each of its steps holds the loop"""
+    value = None
+    error = None
+    while True:
+        t0 = time.perf_counter()
+        try:
+            if error is None:
+                future = coro.send(value)
+            else:
+                future = coro.throw(error)
+        except StopIteration as e:
+            usage.add(time.perf_counter() - t0)
+            return e.value
+        except BaseException:
+            usage.add(time.perf_counter() - t0)
+            raise
+        usage.add(time.perf_counter() - t0)
+        try:
+            value = yield future
+            error = None
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as e:
+            value = None
+            error = e
+
+
+async def _measured_task(coro: Coroutine, usage: LoopUsage):
+    return await _measured(coro, usage)
+
+
+def _task_factory(loop, coro, **kwargs):
+    """Create tasks that count towards the mission that started them
+
+    Tasks inherit the context they are created in, so a task started anywhere
+    inside a mission finds that mission's usage in `_usage`.
+    """
+    usage = _usage.get()
+    if usage is not None:
+        coro = _measured_task(coro, usage)
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+def find_vessel(conn, name: str):
+    """Find a vessel by name, or the active vessel if no name is given"""
+    sc = conn.space_center
+    if not name:
+        return sc.active_vessel
+    for vessel in sc.vessels:
+        if vessel.name == name:
+            return vessel
+    raise KeyError('Vessel not found:', name)
+
+
+async def _fly(mission: Mission, s: Spacecraft):
+    mission.usage.start_time = time.perf_counter()
+    _usage.set(mission.usage)
+    try:
+        await _measured(mission.main(s), mission.usage)
+        mission.finished = True
+        logging.system("%s: End of instructions reached", mission.name)
+    except asyncio.CancelledError:
+        logging.system("%s: Cancelled", mission.name)
+        raise
+    except Exception as e:
+        mission.error = e
+        logging.exception("%s: Errors occurred, mission aborted", mission.name)
+    finally:
+        mission.usage.end_time = time.perf_counter()
+
+
+def prepare(conn, missions: 'list[Mission]'):
+    """Give every mission its own Spacecraft on the shared connection
+
+    All vessels are resolved before any mission starts, so a wrong vessel
+    name does not leave the other missions aborted mid-flight.
+    """
+    flown = {}
+    for mission in missions:
+        vessel = find_vessel(conn, mission.vessel)
+        if vessel in flown:
+            raise ValueError(f'Vessel {vessel.name} is flown by both '
+                             f'{flown[vessel].name} and {mission.name}')
+        flown[vessel] = mission
+    for vessel, mission in flown.items():
+        mission.spacecraft = Spacecraft(conn=conn, vessel=vessel)
+
+
+async def run(missions: 'list[Mission]'):
+    """Fly all prepared missions concurrently on the running loop"""
+    asyncio.get_running_loop().set_task_factory(_task_factory)
+    tasks = []
+    for mission in missions:
+        logging.system("%s: Flying %s", mission.name, mission.spacecraft.ves.name)
+        tasks.append(asyncio.create_task(
+            _fly(mission, mission.spacecraft), name=mission.name))
+    await asyncio.gather(*tasks)
+
+
+def shutdown(loop: asyncio.AbstractEventLoop, missions: 'list[Mission]'):
+    """Cancel whatever is still flying and close the loop
+
+    Threads waiting in timer() and until() only return when the game meets
+    their condition, and the loop would join them when shutting down its
+    executor. Their kRPC events are removed first to wake them, which needs
+    the connection to still be open.
+    """
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    for mission in missions:
+        if mission.spacecraft is not None:
+            mission.spacecraft.waits.release()
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.run_until_complete(loop.shutdown_default_executor())
+    loop.close()
+
+
+def report(missions: 'list[Mission]'):
+    """Log event loop time used by each mission"""
+    for mission in missions:
+        u = mission.usage
+        share = 100 * u.busy / u.elapsed if u.elapsed > 0 else 0.0
+        logging.system(
+            "%s: %.3f s on loop over %.1f s (%.1f%%), %i steps, longest %.3f s",
+            mission.name, u.busy, u.elapsed, share, u.steps, u.longest)
+
+
+def main(argv: 'list[str]'=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m missionlib.runner',
+        description='Fly several missions on one event loop and connection')
+    parser.add_argument('missions', nargs='+', metavar='module[@vessel]',
+                        help='mission module, optionally with vessel name')
+    parser.add_argument('--title', default='Mission runner',
+                        help='kRPC connection name')
+    args = parser.parse_args(argv)
+
+    missions = [Mission.load(spec) for spec in args.missions]
+    conn = krpc.connect(name=args.title)
+    try:
+        prepare(conn, missions)
+    except (KeyError, ValueError) as e:
+        logging.error(' '.join(str(arg) for arg in e.args))
+        logging.system("Terminated before launch")
+        conn.close()
+        return 1
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run(missions))
+    except KeyboardInterrupt:
+        logging.system("Cancelled by user")
+    finally:
+        try:
+            shutdown(loop, missions)
+        finally:
+            report(missions)
+            logging.system("Terminated")
+            conn.close()
+    return 0 if all(m.finished for m in missions) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
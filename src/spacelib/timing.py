@@ -1,11 +1,62 @@
 """Handling of time"""
 import asyncio
+import threading
 from typing import Coroutine
 from spacelib.types import FlightProperty, OrbitProperty, Spacecraft
 from spacelib.telemetry import colorlog
 logger = colorlog.getLogger(__name__)
 
 
+class PendingEvents():
+    """kRPC events that threads are currently waiting on
+
+    A kRPC event wait cannot be interrupted, and closing the connection only
+    wakes the waiting thread for it to wait again. Removing the event stream
+    does release it: the waiter wakes up and raises StreamError. After
+    release(), new waits are refused so that nothing is left blocking on
+    shutdown.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.events = set()
+        self.released = False
+
+    def add(self, event) -> bool:
+        with self.lock:
+            if self.released:
+                return False
+            self.events.add(event)
+            return True
+
+    def discard(self, event):
+        with self.lock:
+            self.events.discard(event)
+
+    def release(self):
+        """Wake every pending waiter. The connection must still be open."""
+        with self.lock:
+            self.released = True
+            events = list(self.events)
+        for event in events:
+            with event.condition:
+                try:
+                    event.remove()
+                except Exception:
+                    logger.warning('Failed to release a pending wait', exc_info=True)
+
+
+def _wait_event(s: Spacecraft, expr):
+    """Block the calling thread until the kRPC expression becomes true"""
+    event = s.conn.krpc.add_event(expr)
+    with event.condition:
+        if not s.waits.add(event):
+            raise RuntimeError('Waits are released, spacecraft is shutting down')
+        try:
+            event.wait()
+        finally:
+            s.waits.discard(event)
+
+
 def timer(s: Spacecraft, seconds) -> Coroutine:
     """Wait for specified in-game seconds.
     
@@ -36,11 +87,7 @@ def timer(s: Spacecraft, seconds) -> Coroutine:
     expr = s.conn.krpc.Expression.greater_than(
         s.conn.krpc.Expression.call(t),
         s.conn.krpc.Expression.constant_double(tf))
-    def _wait():
-        event = s.conn.krpc.add_event(expr)
-        with event.condition:
-            event.wait()
-    return asyncio.to_thread(_wait)
+    return asyncio.to_thread(_wait_event, s, expr)
 
 
 def until(s: Spacecraft, target:float, decreasing=False, **kwargs) -> Coroutine:
@@ -96,9 +143,5 @@ def until(s: Spacecraft, target:float, decreasing=False, **kwargs) -> Coroutine:
             s.conn.krpc.Expression.constant_double(float(target))
         )
     
-    def _wait():
-        event = s.conn.krpc.add_event(expr)
-        logger.timing('Waiting for %s to be %f', keyword, target)
-        with event.condition:
-            event.wait()
-    return asyncio.to_thread(_wait)
+    logger.timing('Waiting for %s to be %f', keyword, target)
+    return asyncio.to_thread(_wait_event, s, expr)